@@ -0,0 +1,254 @@
+import math
+import time
+import logging
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import request, jsonify
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Hard cap on tracked clients; the least recently seen bucket is evicted beyond it
+MAX_TRACKED_CLIENTS = 10000
+# Rejections are logged at most once per interval per route; stats() has the exact counts
+REJECTION_LOG_INTERVAL = 10
+
+
+class TokenBucket:
+    """Token bucket allowing `rate` requests per second with bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def consume(self, now):
+        """Take one token; return (allowed, seconds until a token is available)"""
+        elapsed = max(0, now - self.updated)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True, 0
+        return False, (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """Per-route admission control: per-client rate limit plus a bounded concurrency queue"""
+
+    def __init__(self, name, rate, burst, max_concurrent, max_queue, queue_timeout, retry_after=1):
+        if rate <= 0:
+            raise ValueError(f"{name}: rate must be positive, got {rate}")
+        if burst < 1:
+            raise ValueError(f"{name}: burst must be at least 1, got {burst}")
+        if max_concurrent < 1:
+            raise ValueError(f"{name}: max_concurrent must be at least 1, got {max_concurrent}")
+        if max_queue < 0:
+            raise ValueError(f"{name}: max_queue must not be negative, got {max_queue}")
+        if queue_timeout < 0:
+            raise ValueError(f"{name}: queue_timeout must not be negative, got {queue_timeout}")
+        if retry_after <= 0:
+            raise ValueError(f"{name}: retry_after must be positive, got {retry_after}")
+
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+
+        # Buckets have their own lock so rate checks never contend with queued requests
+        self._bucket_lock = threading.Lock()
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._slot_free = threading.Condition(self._lock)
+        self._active = 0
+        self._waiting = 0
+
+        # Counters exposed through stats() for tuning the limits
+        self.admitted = 0
+        self.queued = 0
+        self.rate_limited = 0
+        self.shed = 0
+        self.timed_out = 0
+        self.peak_waiting = 0
+        self._last_rejection_log = None
+
+    def check_rate(self, client):
+        """Return seconds to wait before retrying, or 0 if the client is within its rate"""
+        now = time.monotonic()
+        with self._bucket_lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst, now)
+                self._buckets[client] = bucket
+                if len(self._buckets) > MAX_TRACKED_CLIENTS:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+            allowed, wait = bucket.consume(now)
+            if not allowed:
+                self.rate_limited += 1
+                return wait
+            return 0
+
+    def refund(self, client):
+        """Give back the token spent by a request the server then rejected itself"""
+        with self._bucket_lock:
+            bucket = self._buckets.get(client)
+            if bucket is not None:
+                bucket.tokens = min(bucket.capacity, bucket.tokens + 1)
+
+    def acquire(self):
+        """Claim a concurrency slot, waiting in the bounded queue if necessary.
+
+        Returns None on success, or 'shed' / 'timeout' when the request must be rejected.
+        """
+        with self._lock:
+            if self._active < self.max_concurrent and self._waiting == 0:
+                self._active += 1
+                self.admitted += 1
+                return None
+            if self._waiting >= self.max_queue:
+                self.shed += 1
+                return 'shed'
+
+            self._waiting += 1
+            self.queued += 1
+            self.peak_waiting = max(self.peak_waiting, self._waiting)
+            deadline = time.monotonic() + self.queue_timeout
+            try:
+                while self._active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timed_out += 1
+                        return 'timeout'
+                    self._slot_free.wait(remaining)
+            finally:
+                self._waiting -= 1
+            self._active += 1
+            self.admitted += 1
+            return None
+
+    def release(self):
+        """Return a concurrency slot and wake one queued request"""
+        with self._lock:
+            self._active -= 1
+            self._slot_free.notify()
+
+    def log_rejection(self):
+        """Log a summary of rejections, throttled so a spike doesn't flood the logs"""
+        now = time.monotonic()
+        last = self._last_rejection_log
+        if last is not None and now - last < REJECTION_LOG_INTERVAL:
+            return
+        self._last_rejection_log = now
+        stats = self.stats()
+        logger.warning(
+            f"Admission control rejecting requests to {self.name}: "
+            f"{stats['rate_limited']} rate limited, {stats['shed']} shed, "
+            f"{stats['timed_out']} timed out so far"
+        )
+
+    def stats(self):
+        """Snapshot of current load and counters"""
+        with self._bucket_lock:
+            tracked_clients = len(self._buckets)
+            rate_limited = self.rate_limited
+        with self._lock:
+            return {
+                'active': self._active,
+                'waiting': self._waiting,
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'admitted': self.admitted,
+                'queued': self.queued,
+                'peak_waiting': self.peak_waiting,
+                'rate_limited': rate_limited,
+                'shed': self.shed,
+                'timed_out': self.timed_out,
+                'tracked_clients': tracked_clients,
+            }
+
+
+# Registry of controllers by route name, used by the stats endpoint
+_controllers = {}
+
+
+def register_controller(controller):
+    """Register `controller` for the stats endpoint; names must be unique"""
+    if controller.name in _controllers:
+        raise ValueError(f"Admission controller '{controller.name}' is already registered")
+    _controllers[controller.name] = controller
+    return controller
+
+
+def admission_stats():
+    """Stats for every registered controller, keyed by route name"""
+    return {name: controller.stats() for name, controller in _controllers.items()}
+
+
+def check_thread_budget(threads):
+    """Warn when the admission-controlled routes could occupy every server thread.
+
+    Queued requests hold a thread while they wait, so static pages only stay
+    responsive while the combined active + queued capacity is below `threads`.
+    """
+    capacity = sum(c.max_concurrent + c.max_queue for c in _controllers.values())
+    if capacity >= threads:
+        logger.warning(
+            f"Admission-controlled routes can hold {capacity} requests but the server "
+            f"only has {threads} threads; static pages may be starved under load"
+        )
+        return False
+    return True
+
+
+def client_key(proxy_hops=0):
+    """Identify the client for rate limiting.
+
+    Behind a reverse proxy the socket peer is the proxy itself, so with
+    `proxy_hops` trusted proxies in front of the app the client is the address
+    recorded by the outermost of them in X-Forwarded-For. Entries further left
+    are supplied by the client and are not trusted.
+    """
+    if proxy_hops and 'X-Forwarded-For' in request.headers:
+        route = request.access_route
+        return route[max(0, len(route) - proxy_hops)]
+    return request.remote_addr or 'unknown'
+
+
+def _reject(status, message, retry_after):
+    response = jsonify({"error": message})
+    response.status_code = status
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def admission_control(controller, proxy_hops=0):
+    """Decorator applying `controller`'s rate and concurrency limits to a view"""
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            client = client_key(proxy_hops)
+            wait = controller.check_rate(client)
+            if wait:
+                controller.log_rejection()
+                return _reject(429, "Too many requests. Please slow down.", wait)
+
+            outcome = controller.acquire()
+            if outcome is not None:
+                # Shedding is the server's overload, not the client's; don't charge for it
+                controller.refund(client)
+                controller.log_rejection()
+                return _reject(503, "Server is busy. Please try again shortly.", controller.retry_after)
+
+            try:
+                return view(*args, **kwargs)
+            finally:
+                controller.release()
+        return wrapped
+    return decorator
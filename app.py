@@ -1,10 +1,12 @@
 import os
+import hmac
 import logging
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, abort
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from chatbot import diagnose_issue
 from emissions_predictor import predict_emissions
+from admission import AdmissionController, register_controller, admission_control, admission_stats, check_thread_budget
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -28,6 +30,37 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
 }
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+# Admission control for the heavier API endpoints. Each route gets a per-client
+# token bucket and a concurrency limit with a bounded wait queue. Active plus
+# queued requests across these routes must stay below the server's thread count
+# (SERVER_THREADS, passed to waitress by wsgi.py and the Procfile and to gunicorn
+# by .replit) so the static pages always have threads left to serve them; a
+# warning is logged at startup otherwise.
+
+# Clients are identified by the socket peer unless ADMISSION_PROXY_HOPS says how
+# many trusted reverse proxies sit in front of the app. Only set it where such a
+# proxy exists (render.yaml, Procfile, .replit): X-Forwarded-For is client-supplied
+# otherwise and would let callers pick their own rate-limit key.
+PROXY_HOPS = int(os.environ.get("ADMISSION_PROXY_HOPS", 0))
+
+chat_admission = register_controller(AdmissionController(
+    'chat',
+    rate=float(os.environ.get("CHAT_RATE_PER_SEC", 1.0)),
+    burst=int(os.environ.get("CHAT_BURST", 5)),
+    max_concurrent=int(os.environ.get("CHAT_MAX_CONCURRENT", 2)),
+    max_queue=int(os.environ.get("CHAT_MAX_QUEUE", 2)),
+    queue_timeout=float(os.environ.get("CHAT_QUEUE_TIMEOUT", 5.0)),
+))
+emissions_admission = register_controller(AdmissionController(
+    'predict_emissions',
+    rate=float(os.environ.get("EMISSIONS_RATE_PER_SEC", 1.0)),
+    burst=int(os.environ.get("EMISSIONS_BURST", 5)),
+    max_concurrent=int(os.environ.get("EMISSIONS_MAX_CONCURRENT", 2)),
+    max_queue=int(os.environ.get("EMISSIONS_MAX_QUEUE", 2)),
+    queue_timeout=float(os.environ.get("EMISSIONS_QUEUE_TIMEOUT", 5.0)),
+))
+check_thread_budget(int(os.environ.get("SERVER_THREADS", 12)))
+
 # Initialize the app with the database extension
 db.init_app(app)
 
@@ -62,6 +95,7 @@ def emissions():
     return render_template('emissions.html', brands=brands)
 
 @app.route('/predict_emissions', methods=['POST'])
+@admission_control(emissions_admission, proxy_hops=PROXY_HOPS)
 def process_emissions():
     """API endpoint for emissions prediction"""
     try:
@@ -97,6 +131,7 @@ def chatbot():
     return render_template('chatbot.html')
 
 @app.route('/chat', methods=['POST'])
+@admission_control(chat_admission, proxy_hops=PROXY_HOPS)
 def chat():
     """API endpoint for chatbot interactions"""
     try:
@@ -133,6 +168,19 @@ def technologies():
     """Upcoming car technologies page route"""
     return render_template('technologies.html')
 
+@app.route('/admission_stats')
+def admission_stats_view():
+    """Admission control counters for tuning the rate and concurrency limits"""
+    # Live load figures are for operators only: the route is disabled unless a
+    # token is configured, and then requires it as a bearer token
+    token = os.environ.get("ADMISSION_STATS_TOKEN")
+    if not token:
+        abort(404)
+    supplied = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(supplied.encode(), f"Bearer {token}".encode()):
+        return jsonify({"error": "Unauthorized"}), 401
+    return jsonify(admission_stats())
+
 # Error handlers
 @app.errorhandler(404)
 def page_not_found(e):
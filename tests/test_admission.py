@@ -0,0 +1,214 @@
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+import admission
+from admission import AdmissionController, admission_control, check_thread_budget, client_key
+
+
+def make_app(controller):
+    """Minimal app with a single admission-controlled route that blocks until released"""
+    test_app = Flask(__name__)
+    release = threading.Event()
+    entered = threading.Event()
+
+    @test_app.route('/work', methods=['POST'])
+    @admission_control(controller)
+    def work():
+        entered.set()
+        release.wait(5)
+        return 'done'
+
+    return test_app, entered, release
+
+
+def wait_for(predicate, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.01)
+
+
+def post_in_thread(test_app, results):
+    thread = threading.Thread(target=lambda: results.append(test_app.test_client().post('/work')))
+    thread.start()
+    return thread
+
+
+def test_rate_limit_returns_429_with_retry_after():
+    controller = AdmissionController('rate', rate=0.5, burst=2, max_concurrent=5, max_queue=0, queue_timeout=1)
+    test_app, _, release = make_app(controller)
+    release.set()
+    client = test_app.test_client()
+
+    assert client.post('/work').status_code == 200
+    assert client.post('/work').status_code == 200
+    response = client.post('/work')
+
+    assert response.status_code == 429
+    # One token takes 2 seconds to refill at 0.5 requests per second
+    assert response.headers['Retry-After'] == '2'
+    assert controller.stats()['rate_limited'] == 1
+
+
+def test_rate_limit_is_per_client():
+    controller = AdmissionController('per_client', rate=0.5, burst=1, max_concurrent=5, max_queue=0, queue_timeout=1)
+    test_app, _, release = make_app(controller)
+    release.set()
+    client = test_app.test_client()
+
+    assert client.post('/work', environ_base={'REMOTE_ADDR': '10.0.0.1'}).status_code == 200
+    assert client.post('/work', environ_base={'REMOTE_ADDR': '10.0.0.1'}).status_code == 429
+    assert client.post('/work', environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code == 200
+
+
+def test_full_queue_sheds_with_503():
+    controller = AdmissionController('shed', rate=100, burst=100, max_concurrent=1, max_queue=1, queue_timeout=5)
+    test_app, entered, release = make_app(controller)
+    results = []
+
+    running = post_in_thread(test_app, results)
+    entered.wait(2)
+    queued = post_in_thread(test_app, results)
+    wait_for(lambda: controller.stats()['waiting'] == 1)
+
+    response = test_app.test_client().post('/work')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+    release.set()
+    running.join()
+    queued.join()
+    assert [r.status_code for r in results] == [200, 200]
+
+    stats = controller.stats()
+    assert stats['admitted'] == 2
+    assert stats['queued'] == 1
+    assert stats['shed'] == 1
+    assert stats['active'] == 0
+
+
+def test_queue_timeout_returns_503():
+    controller = AdmissionController('timeout', rate=100, burst=100, max_concurrent=1, max_queue=1, queue_timeout=0.1)
+    test_app, entered, release = make_app(controller)
+    results = []
+
+    running = post_in_thread(test_app, results)
+    entered.wait(2)
+    response = test_app.test_client().post('/work')
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert controller.stats()['timed_out'] == 1
+
+    release.set()
+    running.join()
+    assert controller.stats()['waiting'] == 0
+
+
+def test_shed_request_keeps_its_rate_token():
+    controller = AdmissionController('refund', rate=0.01, burst=2, max_concurrent=1, max_queue=0, queue_timeout=1)
+    test_app, entered, release = make_app(controller)
+    results = []
+
+    running = post_in_thread(test_app, results)
+    entered.wait(2)
+    assert test_app.test_client().post('/work').status_code == 503
+
+    release.set()
+    running.join()
+    # The shed request was refunded, so the second token is still available
+    assert test_app.test_client().post('/work').status_code == 200
+    assert controller.stats()['rate_limited'] == 0
+
+
+def test_client_key_ignores_forwarded_for_without_proxy():
+    test_app = Flask(__name__)
+    with test_app.test_request_context(environ_base={'REMOTE_ADDR': '10.0.0.9'},
+                                       headers={'X-Forwarded-For': '198.51.100.1'}):
+        assert client_key(proxy_hops=0) == '10.0.0.9'
+
+
+def test_client_key_uses_address_added_by_trusted_proxy():
+    test_app = Flask(__name__)
+    # The left-hand entry is whatever the client sent; the proxy appended the real address
+    with test_app.test_request_context(environ_base={'REMOTE_ADDR': '10.0.0.9'},
+                                       headers={'X-Forwarded-For': '198.51.100.1, 203.0.113.7'}):
+        assert client_key(proxy_hops=1) == '203.0.113.7'
+    with test_app.test_request_context(environ_base={'REMOTE_ADDR': '10.0.0.9'}):
+        assert client_key(proxy_hops=1) == '10.0.0.9'
+
+
+def test_least_recently_seen_client_is_evicted(monkeypatch):
+    monkeypatch.setattr(admission, 'MAX_TRACKED_CLIENTS', 2)
+    controller = AdmissionController('lru', rate=0.01, burst=1, max_concurrent=1, max_queue=0, queue_timeout=1)
+
+    controller.check_rate('a')
+    controller.check_rate('b')
+    assert controller.check_rate('a') > 0  # refreshes 'a', leaving 'b' least recently seen
+    controller.check_rate('c')
+
+    assert controller.stats()['tracked_clients'] == 2
+    # 'a' kept its empty bucket while 'b' was evicted and starts over with a full one
+    assert controller.check_rate('a') > 0
+    assert controller.check_rate('b') == 0
+
+
+def test_thread_budget_warns_when_limits_fill_every_thread(monkeypatch, caplog):
+    controllers = {
+        'one': AdmissionController('one', rate=1, burst=1, max_concurrent=2, max_queue=2, queue_timeout=1),
+        'two': AdmissionController('two', rate=1, burst=1, max_concurrent=2, max_queue=2, queue_timeout=1),
+    }
+    monkeypatch.setattr(admission, '_controllers', controllers)
+
+    assert check_thread_budget(9)
+    assert not caplog.records
+    assert not check_thread_budget(8)
+    assert 'static pages may be starved' in caplog.text
+
+
+@pytest.mark.parametrize('limits', [
+    {'rate': 0},
+    {'burst': 0},
+    {'max_concurrent': 0},
+    {'max_queue': -1},
+    {'queue_timeout': -1},
+])
+def test_invalid_limits_are_rejected(limits):
+    config = dict(rate=1, burst=1, max_concurrent=1, max_queue=0, queue_timeout=1)
+    config.update(limits)
+    with pytest.raises(ValueError):
+        AdmissionController('invalid', **config)
+
+
+@pytest.fixture
+def site(monkeypatch):
+    """The real application, backed by an in-memory database"""
+    # app.py reads DATABASE_URL at import time; never let it touch a configured database
+    monkeypatch.setenv("DATABASE_URL", "sqlite://")
+    from app import app
+    return app
+
+
+def test_admission_stats_is_disabled_without_token(site, monkeypatch):
+    monkeypatch.delenv("ADMISSION_STATS_TOKEN", raising=False)
+    assert site.test_client().get('/admission_stats').status_code == 404
+
+
+def test_admission_stats_requires_token(site, monkeypatch):
+    monkeypatch.setenv("ADMISSION_STATS_TOKEN", "test-token")
+    client = site.test_client()
+    assert client.get('/admission_stats').status_code == 401
+    assert client.get('/admission_stats', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+
+    client.post('/chat', data={'message': 'engine misfiring'}, environ_base={'REMOTE_ADDR': '203.0.113.7'})
+    response = client.get('/admission_stats', headers={'Authorization': 'Bearer test-token'})
+
+    assert response.status_code == 200
+    stats = response.get_json()
+    assert set(stats) == {'chat', 'predict_emissions'}
+    assert stats['chat']['admitted'] >= 1
+    assert stats['chat']['tracked_clients'] >= 1
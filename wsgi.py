@@ -1,5 +1,9 @@
+import os
 from waitress import serve
 from app import app
 
 if __name__ == '__main__':
-    serve(app, host='0.0.0.0', port=8000)
+    # Keep more threads than the admission-controlled routes can occupy
+    # (active + queued) so static pages are never starved by /chat or /predict_emissions
+    threads = int(os.environ.get("SERVER_THREADS", 12))
+    serve(app, host='0.0.0.0', port=8000, threads=threads)